@@ -1,13 +1,17 @@
+import math
+
 import torch
+from torch import Tensor
 
 
-def bessel(x, start=0.0, end=1.0, num_basis=8, eps=1e-5):
+def bessel(x:Tensor, start:float=0.0, end:float=1.0, num_basis:int=8, eps:float=1e-5) -> Tensor:
     """Expand scalar features into (radial) Bessel basis function values.
+    Type-annotated so that it can be compiled with `torch.jit.script`.
     """
     x = x[..., None] - start + eps
     c = end - start
     n = torch.arange(1, num_basis+1, dtype=x.dtype, device=x.device)
-    return ((2/c)**0.5) * torch.sin(n*torch.pi*x / c) / x
+    return ((2/c)**0.5) * torch.sin(n*math.pi*x / c) / x
 
 
 def gaussian(x, start=0.0, end=1.0, num_basis=8):
@@ -85,10 +85,23 @@ class Interaction(torch.nn.Module):
         )
 
     def forward(self, x, node_attr, edge_index, edge_attr, edge_len_emb):
-        i, j = edge_index
-        num_nodes = x.size(0)
+        if torch.jit.is_scripting():
+            # The self-connection is independent of the convolution path, so run them concurrently
+            fut_self_connection = torch.jit.fork(self.sc, x, node_attr)
+            node_conv_out, alpha = self._conv(x, node_attr, edge_index, edge_attr, edge_len_emb)
+            node_self_connection = torch.jit.wait(fut_self_connection)
+        else:
+            node_self_connection = self.sc(x, node_attr)
+            node_conv_out, alpha = self._conv(x, node_attr, edge_index, edge_attr, edge_len_emb)
 
-        node_self_connection = self.sc(x, node_attr)
+        m = self.sc.output_mask
+        alpha = (1 - m) + alpha * m
+        return node_self_connection + alpha * node_conv_out
+        # return node_self_connection + node_conv_out
+
+    def _conv(self, x, node_attr, edge_index, edge_attr, edge_len_emb):
+        i, j = edge_index[0], edge_index[1]  # TorchScript cannot unpack a tensor as a tuple
+        num_nodes = x.size(0)
 
         node_features = self.lin1(x, node_attr)
         # node_features = self.lin1(x)
@@ -98,7 +111,4 @@ class Interaction(torch.nn.Module):
         # node_conv_out = self.lin2(node_features)
 
         alpha = self.alpha(node_features, node_attr)
-        m = self.sc.output_mask
-        alpha = (1 - m) + alpha * m
-        return node_self_connection + alpha * node_conv_out
-        # return node_self_connection + node_conv_out
+        return node_conv_out, alpha
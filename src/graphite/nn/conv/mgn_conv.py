@@ -11,21 +11,36 @@ from torch_geometric.typing import Adj
 from ..mlp import MLP
 
 
+def _split_linear(lin:nn.Linear, xs:List[Tensor]) -> Tensor:
+    """Equivalent to `lin(torch.cat(xs, dim=-1))`, but without materializing the concatenation.
+    Each input is multiplied with its column slice of the weight and accumulated into a single buffer.
+    """
+    out, start = None, 0
+    for x in xs:
+        w = lin.weight[:, start:start + x.size(-1)].t()
+        out = torch.addmm(lin.bias, x, w) if out is None else out.addmm_(x, w)
+        start += x.size(-1)
+    return out
+
+
 class EdgeProcessor(nn.Module):
     """Edge Processor for MeshGraphNets
     Args:
         hs (list of int): Input, hidden, and output dimensions of the MLP processor.
             Example: [32, 128, 128, 64].
+
+    The first layer of the MLP is applied to `x_i`, `x_j`, and `edge_attr` through slices of its weight
+    instead of to their concatenation.
     """
     def __init__(self, hs:List[int]):
         super().__init__()
         self.edge_mlp = nn.Sequential(MLP(hs=hs, act=nn.SiLU()), nn.LayerNorm(hs[-1]))
 
     def forward(self, x_i:Tensor, x_j:Tensor, edge_attr:Tensor, u:Optional[Tensor]=None, batch:Optional[Tensor]=None) -> Tensor:
-        out  = torch.cat([x_i, x_j, edge_attr], dim=-1)
-        out  = self.edge_mlp(out)
-        out += edge_attr
-        return out
+        mlp, norm = self.edge_mlp[0].mlp, self.edge_mlp[1]
+        out  = _split_linear(mlp[0], [x_i, x_j, edge_attr])
+        out  = norm(mlp[1:](out))
+        return out + edge_attr
 
 
 class NodeProcessor(nn.Module):
@@ -33,6 +48,9 @@ class NodeProcessor(nn.Module):
     Args:
         hs (list of int): Input, hidden, and output dimensions of the MLP processor.
             Example: [32, 128, 128, 64].
+
+    As in `EdgeProcessor`, the first layer of the MLP is applied to `x` and the aggregated edge features
+    through slices of its weight instead of to their concatenation.
     """
     def __init__(self, hs:List[int]):
         super().__init__()
@@ -40,29 +58,82 @@ class NodeProcessor(nn.Module):
 
     def forward(self, x:Tensor, edge_index:Adj, edge_attr:Tensor, u:Optional[Tensor]=None, batch:Optional[Tensor]=None) -> Tensor:
         i, j = edge_index
-        out  = scatter(edge_attr, index=i, dim=0, dim_size=x.size(0))
-        out  = torch.cat([x, out], dim=-1)
-        out  = self.node_mlp(out)
-        out += x
-        return out
+        out  = scatter(edge_attr, index=i, dim=0, dim_size=x.size(0), reduce='sum')
+        return self.update(x, out)
+
+    def update(self, x:Tensor, aggr_out:Tensor) -> Tensor:
+        """Node update given the edge features already summed onto each node."""
+        mlp, norm = self.node_mlp[0].mlp, self.node_mlp[1]
+        out  = _split_linear(mlp[0], [x, aggr_out])
+        out  = norm(mlp[1:](out))
+        return out + x
 
 
 class MeshGraphNetsConv(MessagePassing):
-    def __init__(self, node_dim:int, edge_dim:int):
-        super().__init__(aggr='add')
-        self.node_dim = node_dim
-        self.edge_dim = edge_dim
+    """MeshGraphNets node/edge processors as a single message passing layer.
+
+    Edges are updated through `edge_updater` and then summed onto their source nodes `i`
+    (hence `flow='target_to_source'`) within `propagate`, which applies the node update.
+
+    Args:
+        node_dim (int): Node feature dimension.
+        edge_dim (int): Edge feature dimension.
+        compile (bool): Whether to wrap the forward pass with `torch.compile(mode='max-autotune')`
+            (requires `torch>=2.0`), so that e.g. the LayerNorm and residual add are fused.
+            Compilation happens lazily on the first call, and the compiled function is not pickled or copied.
+    """
+    _compile = False
+    _compiled_forward = None
+
+    def __init__(self, node_dim:int, edge_dim:int, compile:bool=False):
+        super().__init__(aggr='add', flow='target_to_source')
+        # Not stored as `node_dim`, which `MessagePassing` uses as the node axis of its inputs
+        self.node_channels = node_dim
+        self.edge_channels = edge_dim
         self.edge_processor = EdgeProcessor([node_dim*2 + edge_dim] + [edge_dim]*3)
         self.node_processor = NodeProcessor([node_dim   + edge_dim] + [node_dim]*3)
-    
+        self._compile = compile
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # The compiled forward is bound to this instance
+        state.pop('_compiled_forward', None)
+        return state
+
+    def __setstate__(self, state):
+        # Models pickled before `edge_updater` was used store the feature dimensions as `node_dim`/`edge_dim`
+        # (overriding the node axis), use `flow='source_to_target'`, and inspected the old message signature.
+        # Take the message passing state of a freshly built layer and keep the pickled weights.
+        if 'node_channels' not in state:
+            new_state = MeshGraphNetsConv(state['node_dim'], state['edge_dim']).__dict__.copy()
+            for key in ('_parameters', '_buffers', '_modules', 'training'):
+                new_state[key] = state[key]
+            state = new_state
+        super().__setstate__(state)
+
     def forward(self, x:Tensor, edge_index:Adj, edge_attr:Tensor) -> Tuple[Tensor, Tensor]:
-        i, j = edge_index
-        edge_attr = self.edge_processor(x[i], x[j], edge_attr)
-        x = self.node_processor(x, edge_index, edge_attr)
+        if self._compile and self._compiled_forward is None:
+            self._compiled_forward = torch.compile(self._forward_impl, mode='max-autotune')
+        forward_impl = self._compiled_forward or self._forward_impl
+        return forward_impl(x, edge_index, edge_attr)
+
+    def _forward_impl(self, x:Tensor, edge_index:Adj, edge_attr:Tensor) -> Tuple[Tensor, Tensor]:
+        edge_attr = self.edge_updater(edge_index, x=x, edge_attr=edge_attr)
+        # `size` is needed since the message has no node arguments to infer the number of nodes from
+        x = self.propagate(edge_index, x=x, edge_attr=edge_attr, size=(x.size(0), x.size(0)))
         return x, edge_attr
 
+    def edge_update(self, x_i:Tensor, x_j:Tensor, edge_attr:Tensor) -> Tensor:
+        return self.edge_processor(x_i, x_j, edge_attr)
+
+    def message(self, edge_attr:Tensor) -> Tensor:
+        return edge_attr
+
+    def update(self, aggr_out:Tensor, x:Tensor) -> Tensor:
+        return self.node_processor.update(x, aggr_out)
+
     def __repr__(self):
-        return f'{self.__class__.__name__}(node_dim={self.node_dim}, edge_dim={self.edge_dim})'
+        return f'{self.__class__.__name__}(node_dim={self.node_channels}, edge_dim={self.edge_channels})'
 
 
 def mgn_conv(node_dim, edge_dim):
@@ -1,12 +1,43 @@
+import copy
+import itertools
+import re
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+
 import torch
 import torch.nn as nn
 
+import e3nn
 from e3nn       import o3
 from e3nn.nn    import Gate
+from e3nn.util.jit import compile_mode, compile as e3nn_compile
 
 from ..conv.e3nn_nequip_interaction import Interaction
 
 
+@contextmanager
+def _e3nn_optimization_defaults(**kwargs):
+    """Temporarily override e3nn's optimization defaults, which apply to e3nn modules as they are built."""
+    defaults = e3nn.get_optimization_defaults()
+    e3nn.set_optimization_defaults(**kwargs)
+    try:
+        yield
+    finally:
+        e3nn.set_optimization_defaults(**defaults)
+
+
+def _version_tuple(version):
+    """Numeric (major, minor, patch) tuple of a version string like '0.5.6'."""
+    return tuple(int(re.match(r'\d*', v).group() or 0) for v in version.split('.')[:3])
+
+
+def _script_shared(module):
+    """Compile a copy of `module` with `e3nn.util.jit.compile` that shares its parameters and buffers."""
+    memo = {id(t): t for t in itertools.chain(module.parameters(), module.buffers())}
+    return e3nn_compile(copy.deepcopy(module, memo))
+
+
+@lru_cache(maxsize=None)
 def tp_path_exists(irreps_in1, irreps_in2, ir_out):
     irreps_in1 = o3.Irreps(irreps_in1).simplify()
     irreps_in2 = o3.Irreps(irreps_in2).simplify()
@@ -27,11 +58,24 @@ class Compose(nn.Module):
         self.irreps_in = self.first.irreps_in
         self.irreps_out = self.second.irreps_out
 
-    def forward(self, *input):
-        x = self.first(*input)
+    def forward(self, x, node_attr, edge_index, edge_attr, edge_len_emb):
+        x = self.first(x, node_attr, edge_index, edge_attr, edge_len_emb)
         return self.second(x)
 
 
+@compile_mode('script')
+class InteractionStack(nn.ModuleList):
+    """Sequence of interaction layers applied in a single `forward` call.
+
+    When compiled with `e3nn.util.jit.compile` (see `NequIP(script_interactions=True)`), the loop
+    over layers runs inside TorchScript instead of the Python interpreter.
+    """
+    def forward(self, x, node_attr, edge_index, edge_attr, edge_len_emb):
+        for layer in self:
+            x = layer(x, node_attr, edge_index, edge_attr, edge_len_emb)
+        return x
+
+
 class NequIP(nn.Module):
     """NequIP model from https://arxiv.org/pdf/2101.03164.pdf.
 
@@ -47,12 +91,43 @@ class NequIP(nn.Module):
             For first and hidden layers, not the output layer.
         max_radius (float): Cutoff radius used during graph construction.
         num_neighbors (float): Typical or average node degree (used for normalization).
+        compile (bool): Whether to wrap the convolution/output layers with `torch.compile`
+            (requires `torch>=2.0` and `e3nn>=0.5.6`).
+        cache_edge_sh (bool): Whether to reuse the edge spherical harmonics of the previous call when it received
+            the very same `data.edge_index` and `data.edge_attr` tensors, unmodified. Intended for inference on
+            fixed geometries; no caching is done when `edge_attr` requires grad.
+        bf16_inference (bool): Whether to run the convolution/output layers under bfloat16 autocast.
+            The spherical harmonics are still computed in the input precision, and the output is cast back to it.
+        script_interactions (bool): Whether to run the interaction layers as a TorchScript module, which removes
+            the per-layer interpreter overhead and runs each layer's self-connection concurrently.
+            Cannot be combined with `compile`.
     
     Notes:
         The `init_embed` function/class must take a PyG graph object `data` as input and output the same object
         with the additional fields `h_node_x`, `h_node_z`, and `h_edge` that correspond to the node, auxilliary node,
-        and edge embeddings.
+        and edge embeddings. It may also set `edge_len` (the norms of `edge_attr`), which is then reused
+        to normalize the edge vectors for the spherical harmonics.
+
+        With `compile=True`, only the tensor-level part of the forward pass (after `init_embed`) is compiled,
+        with dynamic shapes so that varying numbers of nodes/edges do not trigger recompilation. Compilation
+        happens lazily on the first call, and the compiled function is not pickled or copied with the model.
+        The e3nn modules are then built with `jit_script_fx=False`; e3nn's global defaults are left unchanged.
+
+        With `script_interactions=True`, a scripted copy of `interactions` that shares its parameters and buffers
+        is created on the first call. It is rebuilt after device/dtype changes and is not pickled or copied.
+
+        With `cache_edge_sh=True`, only the most recent edge tensors are cached. The cache holds references
+        to them and is invalidated by in-place changes (via their version counters); it is not pickled.
     """
+    # Class-level defaults so that previously pickled models still run
+    _compile = False
+    _compiled_forward = None
+    cache_edge_sh = False
+    _edge_sh_cache = None
+    bf16_inference = False
+    _script_interactions = False
+    _scripted_interactions = None
+
     def __init__(self,
         init_embed,
         irreps_node_x  = '8x0e',
@@ -63,8 +138,17 @@ class NequIP(nn.Module):
         num_convs      = 3,
         radial_neurons = [16, 64],
         num_neighbors  = 12,
+        compile        = False,
+        cache_edge_sh  = False,
+        bf16_inference = False,
+        script_interactions = False,
     ):
         super().__init__()
+        if compile and script_interactions:
+            raise ValueError("`compile` and `script_interactions` cannot be combined; dynamo cannot trace TorchScript modules.")
+        if compile and _version_tuple(e3nn.__version__) < (0, 5, 6):
+            raise RuntimeError(f"`compile=True` requires e3nn>=0.5.6, found e3nn=={e3nn.__version__}.")
+
         self.init_embed     = init_embed
         self.irreps_node_x  = o3.Irreps(irreps_node_x)
         self.irreps_node_z  = o3.Irreps(irreps_node_z)
@@ -72,60 +156,135 @@ class NequIP(nn.Module):
         self.irreps_out     = o3.Irreps(irreps_out)
         self.irreps_edge    = o3.Irreps(irreps_edge)
         self.num_convs      = num_convs
+        self.cache_edge_sh  = cache_edge_sh
+        self._edge_sh_cache = None
+        self.bf16_inference = bf16_inference
+        self._compile       = compile
+        self._script_interactions = script_interactions
 
-        act_scalars = {1: nn.functional.silu, -1: torch.tanh}
-        act_gates   = {1: torch.sigmoid, -1: torch.tanh}
+        # e3nn's TorchScript codegen (applied as its modules are built) cannot be traced by dynamo
+        with _e3nn_optimization_defaults(jit_script_fx=False) if compile else nullcontext():
+            act_scalars = {1: nn.functional.silu, -1: torch.tanh}
+            act_gates   = {1: torch.sigmoid, -1: torch.tanh}
 
-        irreps = self.irreps_node_x
-        self.interactions = nn.ModuleList()
-        for _ in range(num_convs):
-            irreps_scalars = o3.Irreps([(m, ir) for m, ir in self.irreps_hidden if ir.l == 0 and tp_path_exists(irreps, self.irreps_edge, ir)])
-            irreps_gated   = o3.Irreps([(m, ir) for m, ir in self.irreps_hidden if ir.l > 0  and tp_path_exists(irreps, self.irreps_edge, ir)])
+            irreps = self.irreps_node_x
+            self.interactions = InteractionStack()
+            for _ in range(num_convs):
+                irreps_scalars = o3.Irreps([(m, ir) for m, ir in self.irreps_hidden if ir.l == 0 and tp_path_exists(irreps, self.irreps_edge, ir)])
+                irreps_gated   = o3.Irreps([(m, ir) for m, ir in self.irreps_hidden if ir.l > 0  and tp_path_exists(irreps, self.irreps_edge, ir)])
 
-            if irreps_gated.dim > 0:
-                if tp_path_exists(irreps_node_z, self.irreps_edge, "0e"):
-                    ir = "0e"
-                elif tp_path_exists(irreps_node_z, self.irreps_edge, "0o"):
-                    ir = "0o"
+                if irreps_gated.dim > 0:
+                    if tp_path_exists(self.irreps_node_z, self.irreps_edge, "0e"):
+                        ir = "0e"
+                    elif tp_path_exists(self.irreps_node_z, self.irreps_edge, "0o"):
+                        ir = "0o"
+                    else:
+                        raise ValueError(f"irreps={irreps} times irreps_edge={self.irreps_edge} is unable to produce gates needed for irreps_gated={irreps_gated}.")
                 else:
-                    raise ValueError(f"irreps={irreps} times irreps_edge={self.irreps_edge} is unable to produce gates needed for irreps_gated={irreps_gated}.")
-            else:
-                ir = None
-            irreps_gates = o3.Irreps([(mul, ir) for mul, _ in irreps_gated]).simplify()
-
-            gate = Gate(
-                irreps_scalars, [act_scalars[ir.p] for _, ir in irreps_scalars],  # scalar
-                irreps_gates,   [act_gates[ir.p]   for _, ir in irreps_gates],  # gates (scalars)
-                irreps_gated  # gated tensors
-            )
+                    ir = None
+                irreps_gates = o3.Irreps([(mul, ir) for mul, _ in irreps_gated]).simplify()
+
+                gate = Gate(
+                    irreps_scalars, [act_scalars[ir.p] for _, ir in irreps_scalars],  # scalar
+                    irreps_gates,   [act_gates[ir.p]   for _, ir in irreps_gates],  # gates (scalars)
+                    irreps_gated  # gated tensors
+                )
 
-            conv = Interaction(
-                irreps_in      = irreps,
-                irreps_node    = self.irreps_node_z,
-                irreps_edge    = self.irreps_edge,
-                irreps_out     = gate.irreps_in,
-                radial_neurons = radial_neurons,
-                num_neighbors  = num_neighbors,
+                conv = Interaction(
+                    irreps_in      = irreps,
+                    irreps_node    = self.irreps_node_z,
+                    irreps_edge    = self.irreps_edge,
+                    irreps_out     = gate.irreps_in,
+                    radial_neurons = radial_neurons,
+                    num_neighbors  = num_neighbors,
+                )
+                irreps = gate.irreps_out
+                self.interactions.append(Compose(conv, gate))
+
+            self.out = o3.FullyConnectedTensorProduct(
+                irreps_in1 = irreps,
+                irreps_in2 = self.irreps_node_z,
+                irreps_out = self.irreps_out,
             )
-            irreps = gate.irreps_out
-            self.interactions.append(Compose(conv, gate))
 
-        self.out = o3.FullyConnectedTensorProduct(
-            irreps_in1 = irreps,
-            irreps_in2 = self.irreps_node_z,
-            irreps_out = self.irreps_out,
-        )
+        # As a module (rather than `o3.spherical_harmonics`) so that the irreps are not traced by dynamo
+        self.sh = o3.SphericalHarmonics(self.irreps_edge, normalize=False, normalization='component')
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # Cached tensors and the compiled forward/interactions are not part of the model
+        state.pop('_edge_sh_cache', None)
+        state.pop('_compiled_forward', None)
+        state.pop('_scripted_interactions', None)
+        return state
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        # Models pickled before `InteractionStack` hold a plain `ModuleList`
+        if not isinstance(self.interactions, InteractionStack):
+            self.interactions = InteractionStack(self.interactions)
+        # ... and have no spherical harmonics module
+        if 'sh' not in self._modules:
+            self.sh = o3.SphericalHarmonics(self.irreps_edge, normalize=False, normalization='component')
+
+    def _apply(self, fn, *args, **kwargs):
+        # The scripted interactions would keep the buffers from before e.g. a device change
+        self._scripted_interactions = None
+        return super()._apply(fn, *args, **kwargs)
 
     def forward(self, data):
         # Embedding
         data = self.init_embed(data)
         edge_index, edge_attr = data.edge_index, data.edge_attr
         h_node_x, h_node_z, h_edge = data.h_node_x, data.h_node_z, data.h_edge
+        edge_len = data.edge_len if 'edge_len' in data else None
+
+        # Reuse the edge spherical harmonics if the same edges were seen in the previous call
+        edge_sh = None
+        if self.cache_edge_sh and not edge_attr.requires_grad:
+            edge_sh = self._cached_edge_sh(edge_index, edge_attr)
+            if edge_sh is None:
+                edge_sh = self._spherical_harmonics(edge_attr, edge_len).detach()
+                self._edge_sh_cache = (edge_index, edge_index._version, edge_attr, edge_attr._version, edge_sh)
+
+        if self._compile and self._compiled_forward is None:
+            self._compiled_forward = torch.compile(self._forward_impl, fullgraph=True, dynamic=True)
+        if self._script_interactions and self._scripted_interactions is None:
+            # Bypasses `nn.Module.__setattr__` so that the scripted copy is not registered as a submodule
+            self.__dict__['_scripted_interactions'] = _script_shared(self.interactions)
+        forward_impl = self._compiled_forward or self._forward_impl
+        return forward_impl(h_node_x, h_node_z, edge_index, edge_attr, h_edge, edge_len, edge_sh)
+
+    def clear_edge_cache(self):
+        """Drop the cached edge spherical harmonics (see `cache_edge_sh`)."""
+        self._edge_sh_cache = None
+
+    def _cached_edge_sh(self, edge_index, edge_attr):
+        if self._edge_sh_cache is None:
+            return None
+        cached_index, index_version, cached_attr, attr_version, edge_sh = self._edge_sh_cache
+        if (cached_index is edge_index and index_version == edge_index._version and
+            cached_attr  is edge_attr  and attr_version  == edge_attr._version and
+            edge_sh.device == edge_attr.device and edge_sh.size(0) == edge_attr.size(0)):
+            return edge_sh
+        return None
+
+    def _spherical_harmonics(self, edge_attr, edge_len=None):
+        if edge_len is None:
+            edge_len = edge_attr.norm(dim=1)
+        # Same as `normalize=True`, but reusing the norms if given
+        edge_vec = edge_attr / edge_len.clamp(min=1e-12)[:, None]
+        return self.sh(edge_vec)
 
+    def _forward_impl(self, h_node_x, h_node_z, edge_index, edge_attr, h_edge, edge_len=None, edge_sh=None):
         # Graph convolutions
-        edge_sh = o3.spherical_harmonics(self.irreps_edge, edge_attr, normalize=True, normalization='component')
-        for layer in self.interactions:
-            h_node_x = layer(h_node_x, h_node_z, edge_index, edge_sh, h_edge)
+        if edge_sh is None:
+            edge_sh = self._spherical_harmonics(edge_attr, edge_len)
+        autocast = torch.autocast(edge_attr.device.type, dtype=torch.bfloat16) if self.bf16_inference else nullcontext()
+        interactions = self.interactions if self._scripted_interactions is None else self._scripted_interactions
+        with autocast:
+            h_node_x = interactions(h_node_x, h_node_z, edge_index, edge_sh, h_edge)
 
-        # Final output layer
-        return self.out(h_node_x, h_node_z)
+            # Final output layer
+            out = self.out(h_node_x, h_node_z)
+        return out.to(edge_attr.dtype)
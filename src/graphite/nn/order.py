@@ -2,27 +2,85 @@
 Reference: https://freud.readthedocs.io/en/latest/modules/order.html
 """
 
+import warnings
+from functools import lru_cache
+
 import torch
-from torch_geometric.utils import scatter
+from torch_geometric.utils import segment
 
 from e3nn import o3
 
 
+@lru_cache(maxsize=32)
+def _wigner3j(l, device, dtype):
+    """Wigner 3j symbols for (l, l, l), cached per device and dtype."""
+    return o3.wigner_3j(l, l, l).to(device=device, dtype=dtype)
+
+
+@lru_cache(maxsize=32)
+def _wigner3j_nonzero(l, device, dtype):
+    """Indices (3 x nnz) and values of the nonzero entries of the Wigner 3j symbols."""
+    w3j = _wigner3j(l, device, dtype)
+    idx = w3j.nonzero().t()
+    return idx, w3j[tuple(idx)]
+
+
 def steinhardt(l, edge_index, edge_vec, num_nodes, p=1, second_shell_avg=True):
+    w3j_idx, w3j_val = _wigner3j_nonzero(l, edge_vec.device, edge_vec.dtype)
+    return _steinhardt(l, edge_index, edge_vec, num_nodes, p, second_shell_avg, w3j_idx, w3j_val)
+
+
+class Steinhardt(torch.nn.Module):
+    """Module version of `steinhardt`.
+
+    The nonzero Wigner 3j symbols are registered as buffers, so they are moved along with
+    the module (e.g., by `.cuda()`) rather than looked up per call.
+    """
+    def __init__(self, l, p=1, second_shell_avg=True):
+        super().__init__()
+        self.l = l
+        self.p = p
+        self.second_shell_avg = second_shell_avg
+
+        w3j = o3.wigner_3j(l, l, l)
+        idx = w3j.nonzero().t()
+        self.register_buffer('w3j_idx', idx)
+        self.register_buffer('w3j_val', w3j[tuple(idx)])
+
+    def forward(self, edge_index, edge_vec, num_nodes):
+        return _steinhardt(self.l, edge_index, edge_vec, num_nodes, self.p, self.second_shell_avg, self.w3j_idx, self.w3j_val)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(l={self.l}, p={self.p}, second_shell_avg={self.second_shell_avg})'
+
+
+def _steinhardt(l, edge_index, edge_vec, num_nodes, p, second_shell_avg, w3j_idx, w3j_val):
+    # Sort edges by destination (then source) so that the averages below are CSR reductions
+    perm = (edge_index[1] * num_nodes + edge_index[0]).argsort()
+    i, j = edge_index[:, perm]
+    edge_vec = edge_vec[perm]
+    ptr = torch.cat([j.new_zeros(1), torch.bincount(j, minlength=num_nodes).cumsum(0)])
+
     # Compute q_lm
-    i, j = edge_index
     irreps_sh = o3.Irreps([(1, (l, p))])
     sh = o3.spherical_harmonics(irreps_sh, edge_vec, normalize=True, normalization='norm')
-    q_lm = scatter(sh, index=j, dim=0, reduce='mean', dim_size=num_nodes)
+    q_lm = segment(sh, ptr, reduce='mean')
 
-    # If performing a second averaging to include second shell neighbors
+    # If performing a second averaging to include second shell neighbors,
+    # done as a product with the row-normalized adjacency matrix to avoid gathering q_lm[i]
     if second_shell_avg:
-        q_lm = scatter(q_lm[i], index=j, dim=0, reduce='mean', dim_size=num_nodes)
+        deg = ptr.diff().clamp(min=1).to(q_lm.dtype)
+        # The indices are valid by construction; the warning that sparse CSR support is in beta is silenced
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', message='Sparse CSR tensor support is in beta')
+            adj = torch.sparse_csr_tensor(ptr, i, deg.reciprocal()[j], size=(num_nodes, num_nodes), check_invariants=False)
+        q_lm = torch.sparse.mm(adj, q_lm)
 
     q_lm_square_sum = q_lm.abs().pow(2).sum(1)
 
-    # Compute w_l
-    w_l = torch.einsum('li, lj, lk, ijk -> l', q_lm, q_lm, q_lm, o3.wigner_3j(l,l,l).to(q_lm.device))
+    # Compute w_l, only summing over the nonzero Wigner 3j symbols
+    m1, m2, m3 = w3j_idx
+    w_l = (q_lm[:, m1] * q_lm[:, m2] * q_lm[:, m3] * w3j_val).sum(dim=1)
     w_l = w_l / q_lm_square_sum.pow(3/2)
 
     # Compute q_l
@@ -1,23 +1,40 @@
-from functools import partial
+from functools import lru_cache
 
+import torch
 from torch import nn
 
 from graphite.nn.basis import bessel
 
 
+@lru_cache(maxsize=None)
+def _scripted_bessel():
+    """`bessel` compiled with TorchScript (so that its elementwise ops are fused), done on first use."""
+    return torch.jit.script(bessel)
+
+
 class InitialEmbedding(nn.Module):
     def __init__(self, num_species, cutoff):
         super().__init__()
         self.embed_node_x = nn.Embedding(num_species, 8)
         self.embed_node_z = nn.Embedding(num_species, 8)
-        self.embed_edge = partial(bessel, start=0.0, end=cutoff, num_basis=16)
+        self.cutoff = float(cutoff)
+        self.num_basis = 16
+
+    def __setstate__(self, state):
+        # Models pickled before `cutoff` was stored hold the basis as `partial(bessel, end=cutoff, num_basis=...)`
+        if 'embed_edge' in state:
+            keywords = state.pop('embed_edge').keywords
+            state['cutoff'] = float(keywords['end'])
+            state['num_basis'] = keywords['num_basis']
+        super().__setstate__(state)
 
     def forward(self, data):
         # Embed node
         data.h_node_x = self.embed_node_x(data.x)
         data.h_node_z = self.embed_node_z(data.x)
 
-        # Embed edge
-        data.h_edge = self.embed_edge(data.edge_attr.norm(dim=-1))
+        # Embed edge (the lengths are kept so that the model can reuse them)
+        data.edge_len = data.edge_attr.norm(dim=-1)
+        data.h_edge = _scripted_bessel()(data.edge_len, 0.0, self.cutoff, self.num_basis)
 
         return data